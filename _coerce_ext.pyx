@@ -0,0 +1,134 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Compiled counterpart of test4._coerce for ASCII blocks.
+
+Optional build step (requires Cython):
+
+    pip install cython && cythonize -i _coerce_ext.pyx
+
+test4.py only routes ASCII blocks here, so the byte-level character
+classes below match str.isalnum()/str.isspace() exactly; anything else
+uses the pure-Python scanner, as does everything when the extension is
+not built.
+"""
+from libc.string cimport memcmp, memcpy
+
+cdef enum:
+    TAB = 9
+    NEWLINE = 10
+    CR = 13
+    SPACE = 32
+    DQUOTE = 34
+    SQUOTE = 39
+    PLUS = 43
+    COMMA = 44
+    MINUS = 45
+    DOT = 46
+    COLON = 58
+    BACKSLASH = 92
+    RBRACKET = 93
+    UNDERSCORE = 95
+    RBRACE = 125
+
+
+cdef inline bint _is_space(unsigned char c) nogil:
+    # str.isspace() for ASCII also covers the \x1c-\x1f separators
+    return c == SPACE or TAB <= c <= CR or 28 <= c <= 31
+
+
+cdef inline bint _is_ident(unsigned char c) nogil:
+    return (48 <= c <= 57) or (65 <= c <= 90) or (97 <= c <= 122) or c == UNDERSCORE
+
+
+cdef inline bint _is_token(unsigned char c) nogil:
+    return _is_ident(c) or c == DOT or c == MINUS or c == PLUS
+
+
+cdef inline Py_ssize_t _skip_space(const unsigned char* src, Py_ssize_t i, Py_ssize_t n) nogil:
+    while i < n and _is_space(src[i]):
+        i += 1
+    return i
+
+
+cpdef bytes coerce(bytes block):
+    """Convert a single-quoted, loosely keyed ASCII question block to JSON in one pass"""
+    cdef const unsigned char* src = block
+    cdef Py_ssize_t n = len(block)
+    cdef Py_ssize_t i = 0, j = 0, k, start, length
+    cdef unsigned char c, nxt, in_string = 0
+    # Every rewrite at most doubles its input, so 2n bounds the output
+    out = bytearray(2 * n)
+    cdef unsigned char* dst = out
+    while i < n:
+        c = src[i]
+        if in_string:
+            if c == BACKSLASH and i + 1 < n:
+                nxt = src[i + 1]
+                if nxt == SQUOTE:
+                    dst[j] = SQUOTE
+                    j += 1
+                else:
+                    dst[j] = c
+                    dst[j + 1] = nxt
+                    j += 2
+                i += 2
+                continue
+            if c == in_string:
+                # A quote only closes the string when a delimiter follows;
+                # otherwise it is an apostrophe inside the value
+                k = _skip_space(src, i + 1, n)
+                if k == n or src[k] == COMMA or src[k] == COLON or src[k] == RBRACE or src[k] == RBRACKET:
+                    dst[j] = DQUOTE
+                    j += 1
+                    in_string = 0
+                elif c == SQUOTE:
+                    dst[j] = SQUOTE
+                    j += 1
+                else:
+                    dst[j] = BACKSLASH
+                    dst[j + 1] = DQUOTE
+                    j += 2
+            elif c == DQUOTE:
+                dst[j] = BACKSLASH
+                dst[j + 1] = DQUOTE
+                j += 2
+            elif c == NEWLINE:
+                dst[j] = BACKSLASH
+                dst[j + 1] = 110  # 'n'
+                j += 2
+            else:
+                dst[j] = c
+                j += 1
+            i += 1
+        elif c == SQUOTE or c == DQUOTE:
+            dst[j] = DQUOTE
+            j += 1
+            in_string = c
+            i += 1
+        elif _is_ident(c):
+            start = i
+            while i < n and _is_token(src[i]):
+                i += 1
+            length = i - start
+            k = _skip_space(src, i, n)
+            if k < n and src[k] == COLON:
+                dst[j] = DQUOTE
+                memcpy(dst + j + 1, src + start, length)
+                dst[j + 1 + length] = DQUOTE
+                j += length + 2
+            elif length == 4 and memcmp(src + start, b"True", 4) == 0:
+                memcpy(dst + j, b"true", 4)
+                j += 4
+            elif length == 5 and memcmp(src + start, b"False", 5) == 0:
+                memcpy(dst + j, b"false", 5)
+                j += 5
+            elif length == 4 and memcmp(src + start, b"None", 4) == 0:
+                memcpy(dst + j, b"null", 4)
+                j += 4
+            else:
+                memcpy(dst + j, src + start, length)
+                j += length
+        else:
+            dst[j] = c
+            j += 1
+            i += 1
+    return bytes(out[:j])
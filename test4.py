@@ -1,28 +1,49 @@
 import streamlit as st
-import json
-import re
+import orjson
 import os
-from groq import Groq
+import math
+import threading
+from io import BytesIO
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+import urllib.request
+import httpx
+from groq import Groq, BadRequestError, RateLimitError, DefaultHttpxClient, DEFAULT_CONNECTION_LIMITS
 from gtts import gTTS
-import tempfile
-from tenacity import retry, stop_after_attempt, wait_fixed
-
-# Initialize session state
-if 'quiz' not in st.session_state:
-    st.session_state.quiz = {
-        'api_key': None,
-        'user_details': {},
-        'questions': [],
-        'current_q': 0,
-        'score': 0,
-        'difficulty': 'beginner',
-        'history': [],
-        'feedback': '',
-        'chat_history': [],
-        'raw_response': None,
-        'parsing_errors': [],
-        'attempt_count': 0
-    }
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Initialize session state: one key per field so updates only touch their own slot
+QUIZ_DEFAULTS = {
+    'api_key': None,
+    'user_details': {},
+    'questions': [],
+    'current_q': 0,
+    'score': 0,
+    'difficulty': 'beginner',
+    'history': [],
+    'feedback': '',
+    'study_plan': '',
+    'chat_history': [],
+    'raw_response': None,
+    'parsing_errors': [],
+    'attempt_count': 0,
+    'generation_warning': '',
+    'audio': {}
+}
+
+def init_session_state():
+    """Create any missing quiz_<field> session keys"""
+    for key, value in QUIZ_DEFAULTS.items():
+        st.session_state.setdefault(f'quiz_{key}', value)
+
+# Groq model used for generation, feedback and chat
+MODEL = os.environ.get('GROQ_MODEL', 'llama-3.1-8b-instant')
+
+# Questions requested per LLM call when generation is fanned out
+CHUNK_SIZE = 5
+
+# Python literals the model sometimes emits in place of JSON ones
+_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
 
 # System instructions with strict formatting
 SYSTEM_INSTRUCTION = """
@@ -66,74 +87,376 @@ EXAMPLE:
 }
 """
 
+# JSON-mode variant: constrained decoding enforces the syntax, so only the schema
+# and answer rule remain (a fraction of the block-format prompt's prefill tokens)
+SYSTEM_INSTRUCTION_JSON = (
+    "You are a quiz generator. Return JSON: "
+    '{"questions":[{"Question":"...","Options":{"OptionA":"...","OptionB":"...","OptionC":"...","OptionD":"..."},"Answer":"..."}]}. '
+    "Each option key maps to that option's text. Answer must exactly match one option value. "
+    "Questions must be unique and age-appropriate."
+)
+
+# Ask for JSON mode first; models without it fall back to the streamed block format
+JSON_MODE = True
+
+def _http_client():
+    """SDK-default httpx client whose transport retries failed connections"""
+    # httpx ignores HTTP(S)_PROXY once a transport is passed, so mount the env proxy here;
+    # the transport also owns the pool, so it takes the SDK's connection limits
+    proxies = urllib.request.getproxies()
+    proxy = proxies.get('https') or proxies.get('all')
+    if proxy and urllib.request.proxy_bypass('api.groq.com'):
+        proxy = None
+    return DefaultHttpxClient(transport=httpx.HTTPTransport(
+        retries=3, proxy=proxy, limits=DEFAULT_CONNECTION_LIMITS
+    ))
+
+@st.cache_resource(show_spinner=False)
+def _client(api_key: str):
+    """Build one Groq client per API key so its connection pool is reused"""
+    # Connection failures retry at the transport; the SDK retries 429/5xx itself
+    return Groq(api_key=api_key, http_client=_http_client())
+
 def get_groq_client():
     """Initialize Groq client with validation"""
-    if not st.session_state.quiz['api_key']:
+    if not st.session_state.quiz_api_key:
         st.warning("🔑 Please enter your Groq API key")
         st.stop()
     try:
-        return Groq(api_key=st.session_state.quiz['api_key'])
+        return _client(st.session_state.quiz_api_key)
     except Exception as e:
         st.error(f"❌ API Connection Error: {str(e)}")
         st.stop()
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-def generate_questions(prompt):
-    """Generate questions with retry logic"""
-    client = get_groq_client()
+class QuestionParseError(ValueError):
+    """Raised when a response yields no questions; carries context for the debug panel"""
+    def __init__(self, raw_response, errors):
+        super().__init__("No questions could be parsed from the response")
+        self.raw_response = raw_response
+        self.errors = errors
+
+def _valid_question(q):
+    """Check a parsed question has the fields and string values the quiz UI relies on"""
+    return (isinstance(q, dict)
+            and isinstance(q.get('Question'), str)
+            and isinstance(q.get('Answer'), str)
+            and isinstance(q.get('Options'), dict) and bool(q['Options'])
+            and all(isinstance(v, str) for v in q['Options'].values()))
+
+def _generate_json(prompt, model, client):
+    """Request questions in JSON mode and decode the whole payload at once"""
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_INSTRUCTION_JSON},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.5,
+        max_tokens=4000,
+        response_format={"type": "json_object"}
+    )
+    raw_response = response.choices[0].message.content
+    questions = orjson.loads(raw_response)["questions"]
+    if not questions or not all(_valid_question(q) for q in questions):
+        raise ValueError("JSON response does not match the question schema")
+    return questions, raw_response, []
+
+def _generate_streamed(prompt, model, client):
+    """Stream the **QuestionN** block format and parse questions as they arrive"""
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_INSTRUCTION},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.5,
+        max_tokens=4000,
+        stream=True
+    )
+    parser = IncrementalQuestionParser()
+    raw_parts = []
+    for chunk in response:
+        text = chunk.choices[0].delta.content or ''
+        raw_parts.append(text)
+        parser.feed(text)
+    parser.close()
+    return parser.questions, ''.join(raw_parts), parser.errors
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=64)
+def _cached_generate(prompt: str, model: str, _groq) -> tuple[list[dict], str, list[dict]]:
+    """Generate and parse questions for a prompt; returns (questions, raw response, parse errors)"""
+    result = None
+    if JSON_MODE:
+        try:
+            result = _generate_json(prompt, model, _groq)
+        except (BadRequestError, ValueError, KeyError, TypeError, AttributeError):
+            # Unsupported model or malformed JSON: use the block format instead
+            result = None
+    if result is None:
+        result = _generate_streamed(prompt, model, _groq)
+    questions, raw_response, errors = result
+    if not questions:
+        # Raising keeps empty results out of the cache
+        raise QuestionParseError(raw_response, errors)
+    return result
+
+def _run_generation(prompt, model, client):
+    """Generate one batch without touching Streamlit state, so it is safe in worker threads"""
+    result = {'questions': [], 'raw_response': None, 'errors': [], 'failure': None}
     try:
-        response = client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=[
-                {"role": "system", "content": SYSTEM_INSTRUCTION},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-            max_tokens=4000
-        )
-        raw_response = response.choices[0].message.content
-        st.session_state.quiz['raw_response'] = raw_response
-        return extract_questions(raw_response)
+        result['questions'], result['raw_response'], result['errors'] = _cached_generate(prompt, model, client)
+    except QuestionParseError as e:
+        result.update(raw_response=e.raw_response, errors=e.errors, failure=str(e))
+    except RateLimitError:
+        result['failure'] = "Groq rate limit reached. Please wait a moment and try again."
     except Exception as e:
-        st.session_state.quiz['attempt_count'] += 1
-        st.error(f"⚠️ Attempt {st.session_state.quiz['attempt_count']} failed: {str(e)}")
+        result['failure'] = str(e)
+    return result
+
+def _record_results(results):
+    """Apply batch results to session state on the main thread and merge their questions"""
+    if len(results) == 1:
+        st.session_state.quiz_raw_response = results[0]['raw_response']
+    else:
+        st.session_state.quiz_raw_response = '\n\n'.join(
+            f"--- Batch {i} ---\n{r['raw_response'] or 'No response captured'}"
+            for i, r in enumerate(results, 1)
+        )
+    for r in results:
+        st.session_state.quiz_parsing_errors.extend(r['errors'])
+        if r['failure']:
+            st.session_state.quiz_attempt_count += 1
+            st.error(f"⚠️ Attempt {st.session_state.quiz_attempt_count} failed: {r['failure']}")
+    questions = list(chain.from_iterable(r['questions'] for r in results))
+    for q in questions:
+        q['_options'] = list(q['Options'].values())
+    return questions
+
+def generate_questions(prompt, model=MODEL):
+    """Generate questions, reusing cached results for identical prompts"""
+    client = get_groq_client()
+    return _record_results([_run_generation(prompt, model, client)])
+
+def _coerce(block: str) -> bytes:
+    """Convert a single-quoted, loosely keyed question block to JSON in one pass"""
+    out = []
+    n = len(block)
+    i = 0
+    in_string = None  # quote char of the open string, if any
+    while i < n:
+        c = block[i]
+        if in_string:
+            if c == '\\' and i + 1 < n:
+                nxt = block[i + 1]
+                out.append("'" if nxt == "'" else c + nxt)
+                i += 2
+                continue
+            if c == in_string:
+                # A quote only closes the string when a delimiter follows;
+                # otherwise it is an apostrophe inside the value
+                j = i + 1
+                while j < n and block[j].isspace():
+                    j += 1
+                if j == n or block[j] in ',:}]':
+                    out.append('"')
+                    in_string = None
+                else:
+                    out.append("'" if c == "'" else '\\"')
+            elif c == '"':
+                out.append('\\"')
+            elif c == '\n':
+                out.append('\\n')
+            else:
+                out.append(c)
+            i += 1
+        elif c in '\'"':
+            out.append('"')
+            in_string = c
+            i += 1
+        elif c.isalnum() or c == '_':
+            key_start = i
+            while i < n and (block[i].isalnum() or block[i] in '_.-+'):
+                i += 1
+            token = block[key_start:i]
+            j = i
+            while j < n and block[j].isspace():
+                j += 1
+            if j < n and block[j] == ':':
+                out.append(f'"{token}"')
+            else:
+                out.append(_LITERALS.get(token, token))
+        else:
+            out.append(c)
+            i += 1
+    return ''.join(out).encode()
+
+# Prefer the compiled scanner when _coerce_ext.pyx has been built (cythonize -i _coerce_ext.pyx)
+try:
+    from _coerce_ext import coerce as _coerce_compiled
+except ImportError:
+    pass
+else:
+    _coerce_python = _coerce
+
+    def _coerce(block: str) -> bytes:
+        # The extension classifies ASCII bytes only; other text keeps str semantics
+        if block.isascii():
+            return _coerce_compiled(block.encode())
+        return _coerce_python(block)
+
+class IncrementalQuestionParser:
+    """Emit each **QuestionN** {...} block as soon as its closing brace arrives"""
+    HEADER = '**Question'
+
+    def __init__(self):
+        self.questions = []
+        self.errors = []
+        self._buf = ''
+        self._pos = 0
+        self._armed = False  # header seen, waiting for the opening brace
+        self._start = None   # index of the opening brace of the current block
+        self._depth = 0
+        self._quote = None   # quote char of the open string, if any
+
+    def feed(self, text):
+        """Consume a chunk of the response and return the questions it completed"""
+        self._buf += text
+        completed = []
+        while True:
+            if self._start is None:
+                if not self._armed:
+                    idx = self._buf.find(self.HEADER, self._pos)
+                    if idx == -1:
+                        # Keep a tail in case the header is split across chunks
+                        self._buf = self._buf[-(len(self.HEADER) - 1):]
+                        self._pos = 0
+                        break
+                    self._armed = True
+                    self._pos = idx + len(self.HEADER)
+                idx = self._buf.find('{', self._pos)
+                if idx == -1:
+                    self._pos = len(self._buf)
+                    break
+                self._start, self._depth, self._pos = idx, 1, idx + 1
+            scanned = self._scan()
+            if scanned is None:
+                break
+            end, closed = scanned
+            if closed:
+                question = self._parse(self._buf[self._start:end])
+                if question is not None:
+                    completed.append(question)
+            else:
+                # The next header arrived before the braces balanced
+                self._error('Unterminated Block', 'Block was not closed before the next question',
+                            self._buf[self._start:end])
+            self._buf = self._buf[end:]
+            self._pos, self._start, self._armed, self._quote = 0, None, False, None
+        self.questions.extend(completed)
+        return completed
+
+    def close(self):
+        """Flush at end of stream; a block that is still open is recorded as an error"""
+        if self._start is not None:
+            self._error('Unterminated Block', 'Response ended before the block was closed',
+                        self._buf[self._start:])
+        self._buf, self._pos, self._start, self._armed, self._quote = '', 0, None, False, None
+
+    def _scan(self):
+        """Advance over new input; return (end, closed) once the block balances
+        (closed=True) or the next header starts inside it (closed=False)"""
+        buf = self._buf
+        n = len(buf)
+        i = self._pos
+        while i < n:
+            c = buf[i]
+            if c == '*':
+                if buf.startswith(self.HEADER, i):
+                    return i, False
+                if self.HEADER.startswith(buf[i:]):
+                    break  # possibly a header split across chunks
+            if self._quote:
+                if c == '\\':
+                    if i + 1 == n:
+                        break
+                    i += 2
+                    continue
+                if c == self._quote:
+                    # Same rule as _coerce: a quote only closes before a delimiter
+                    j = i + 1
+                    while j < n and buf[j].isspace():
+                        j += 1
+                    if j == n:
+                        break  # need more input to decide
+                    if buf[j] in ',:}]':
+                        self._quote = None
+            elif c in '\'"':
+                self._quote = c
+            elif c == '{':
+                self._depth += 1
+            elif c == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    return i + 1, True
+            i += 1
+        self._pos = i
         return None
 
-def extract_questions(response):
-    """Extract and parse questions from API response with enhanced regex"""
-    question_blocks = re.findall(r'\*\*Question\d+\*\*\s*({.*?})\s*(?=\*\*Question\d+\*\*|$)', response, re.DOTALL)
-    
-    questions = []
-    for block in question_blocks:
+    def _parse(self, block):
         try:
-            # Convert to valid JSON
-            json_str = block.replace("'", '"')
-            json_str = re.sub(r'(\w+)(\s*:\s*)', r'"\1"\2', json_str)  # Add quotes to keys
-            question_data = json.loads(json_str)
-            questions.append(question_data)
-        except json.JSONDecodeError as e:
-            st.session_state.quiz['parsing_errors'].append({
-                'error_type': 'JSON Decode',
-                'message': str(e),
-                'block': block
-            })
-    return questions
+            question = orjson.loads(_coerce(block))
+        except (orjson.JSONDecodeError, ValueError) as e:
+            self._error('JSON Decode', str(e), block)
+            return None
+        if not _valid_question(question):
+            # Rejected here so one malformed block cannot break the merged quiz
+            self._error('Schema', 'Expected string Question and Answer and a dict of string Options', block)
+            return None
+        return question
+
+    def _error(self, error_type, message, block):
+        self.errors.append({
+            'error_type': error_type,
+            'message': message,
+            'block': block
+        })
+
+@st.cache_data(show_spinner=False)
+def synth(text: str) -> bytes:
+    """Synthesize MP3 bytes for text (cached across quizzes)"""
+    buf = BytesIO()
+    gTTS(text=text, lang='en').write_to_fp(buf)
+    return buf.getvalue()
 
 def text_to_speech(text):
     """Convert text to audio with error handling"""
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as fp:
-            tts = gTTS(text=text, lang='en')
-            tts.save(fp.name)
-            return fp.name
+        return synth(text)
     except Exception as e:
         st.error(f"🔇 TTS Error: {str(e)}")
         return None
 
+def _try_synth(text):
+    """Worker-thread wrapper: failures are reported once, on the main thread"""
+    try:
+        return synth(text)
+    except Exception:
+        return None
+
+def precompute_audio(questions):
+    """Synthesize audio for all questions in parallel, keyed by question index"""
+    # synth is an st.cache_data function, so workers need the script context
+    with _thread_pool(8) as pool:
+        audio = list(pool.map(_try_synth, [q['Question'] for q in questions]))
+    failed = audio.count(None)
+    if failed:
+        st.warning(f"🔇 Audio unavailable for {failed} question(s)")
+    return {i: data for i, data in enumerate(audio) if data}
+
 def user_details_form():
     """Collect user information"""
     with st.form("user_details"):
-        st.session_state.quiz['user_details'] = {
+        st.session_state.quiz_user_details = {
             'name': st.text_input("Student Name"),
             'grade': st.number_input("Grade Level", min_value=1, max_value=12, value=5),
             'subject': st.selectbox("Subject", ["Math", "Science", "History", "English"]),
@@ -144,95 +467,173 @@ def user_details_form():
         if st.form_submit_button("🚀 Start Quiz"):
             generate_quiz()
 
-def generate_quiz():
-    """Generate new quiz questions"""
-    details = st.session_state.quiz['user_details']
+def _thread_pool(max_workers):
+    """Thread pool whose workers carry the script context that Streamlit caches expect"""
+    ctx = get_script_run_ctx()
+    return ThreadPoolExecutor(max_workers=max_workers,
+                              initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx))
+
+def build_prompt(details, num_questions, batch=None):
+    """Build the question generation prompt, optionally for one batch of several"""
     prompt = f"""
-    Generate {details['num_questions']} {details['subject']} questions about {details['topic']}
+    Generate {num_questions} {details['subject']} questions about {details['topic']}
     for a {details['grade']}th grade student at {details['difficulty']} level.
     """
+    if batch:
+        index, total = batch
+        prompt += f"""
+    This is batch {index} of {total}: cover a different aspect of the topic than
+    the other batches so no question is repeated.
+    """
+    return prompt
+
+def generate_questions_parallel(details):
+    """Split large quizzes into concurrent requests of CHUNK_SIZE questions each"""
+    total = details['num_questions']
+    chunks = math.ceil(total / CHUNK_SIZE)
+    prompts = [
+        build_prompt(details, min(CHUNK_SIZE, total - i * CHUNK_SIZE), (i + 1, chunks))
+        for i in range(chunks)
+    ]
+    client = get_groq_client()
+    with _thread_pool(4) as pool:
+        results = list(pool.map(lambda prompt: _run_generation(prompt, MODEL, client), prompts))
+    return _record_results(results)
+
+def generate_quiz():
+    """Generate new quiz questions"""
+    details = st.session_state.quiz_user_details
     
+    st.session_state.quiz_generation_warning = ''
+    # Cache hits replay their parse errors, so start each generation with a clean list
+    st.session_state.quiz_parsing_errors = []
     with st.spinner("🧠 Generating questions..."):
-        questions = generate_questions(prompt)
+        if details['num_questions'] >= 10:
+            questions = generate_questions_parallel(details)
+        else:
+            questions = generate_questions(build_prompt(details, details['num_questions']))
+    
+    if questions and len(questions) < details['num_questions']:
+        # Shown after the rerun, which would otherwise clear the batch errors
+        st.session_state.quiz_generation_warning = (
+            f"Only {len(questions)} of {details['num_questions']} questions could be generated; "
+            "check the debug panel (?debug=1) for details."
+        )
     
     if questions:
-        st.session_state.quiz.update({
-            'questions': questions,
-            'current_q': 0,
-            'score': 0,
-            'history': [],
-            'feedback': '',
-            'attempt_count': 0
+        with st.spinner("🔊 Preparing audio..."):
+            audio = precompute_audio(questions)
+        st.session_state.update({
+            'quiz_questions': questions,
+            'quiz_audio': audio,
+            'quiz_current_q': 0,
+            'quiz_score': 0,
+            'quiz_history': [],
+            'quiz_feedback': '',
+            'quiz_study_plan': '',
+            'quiz_attempt_count': 0
         })
         st.rerun()
     else:
         st.error("❌ Failed to generate questions. Please try a different topic or reduce question count.")
 
+@st.fragment
 def show_question():
-    """Display current question with audio"""
-    q_idx = st.session_state.quiz['current_q']
-    q = st.session_state.quiz['questions'][q_idx]
+    """Display current question with audio; radio changes rerun only this fragment"""
+    q_idx = st.session_state.quiz_current_q
+    q = st.session_state.quiz_questions[q_idx]
     
     st.subheader(f"❓ Question {q_idx + 1}")
     st.markdown(f"**{q['Question']}**")
     
     # Audio version
-    if audio_file := text_to_speech(q['Question']):
-        st.audio(audio_file)
-        os.unlink(audio_file)
+    if q_idx not in st.session_state.quiz_audio:
+        if audio_bytes := text_to_speech(q['Question']):
+            st.session_state.quiz_audio[q_idx] = audio_bytes
+    if audio_bytes := st.session_state.quiz_audio.get(q_idx):
+        st.audio(audio_bytes, format='audio/mp3')
     
-    # Answer selection using option values
-    options = list(q['Options'].values())
-    user_answer = st.radio("Options:", options, index=None, key=f"q{q_idx}")
+    # Answer selection using option values; the form only reruns on submit
+    with st.form(f"q{q_idx}_form"):
+        user_answer = st.radio("Options:", q['_options'], index=None, key=f"q{q_idx}")
+        submitted = st.form_submit_button("✅ Submit Answer")
     
-    if st.button("✅ Submit Answer"):
-        process_answer(q, user_answer)
+    if submitted:
+        if user_answer is None:
+            st.warning("Please select an answer first")
+        else:
+            process_answer(q, user_answer)
 
 def process_answer(q, user_answer):
     """Handle answer submission and progression"""
-    is_correct = user_answer.strip() == q['Answer'].strip()
-    
-    st.session_state.quiz['history'].append({
-        'question': q['Question'],
-        'user_answer': user_answer,
-        'correct_answer': q['Answer'],
-        'is_correct': is_correct
-    })
-    
-    if is_correct:
-        st.session_state.quiz['score'] += 1
+    # A resubmit after a failed feedback call must not record the answer twice
+    if len(st.session_state.quiz_history) == st.session_state.quiz_current_q:
+        is_correct = user_answer.strip() == q['Answer'].strip()
+        
+        st.session_state.quiz_history.append({
+            'question': q['Question'],
+            'user_answer': user_answer,
+            'correct_answer': q['Answer'],
+            'is_correct': is_correct
+        })
+        
+        if is_correct:
+            st.session_state.quiz_score += 1
     
-    if st.session_state.quiz['current_q'] < len(st.session_state.quiz['questions']) - 1:
-        st.session_state.quiz['current_q'] += 1
+    if st.session_state.quiz_current_q < len(st.session_state.quiz_questions) - 1:
+        st.session_state.quiz_current_q += 1
         st.rerun()
     else:
         generate_feedback()
+        if st.session_state.quiz_feedback:
+            # Full rerun so the report renders outside the question fragment
+            st.rerun()
+        # On failure stay put so the feedback error remains visible
+        st.info("Submit again to retry the performance report")
 
 def generate_feedback():
     """Generate AI performance analysis"""
-    details = st.session_state.quiz['user_details']
+    details = st.session_state.quiz_user_details
+    # Only wrong answers carry their text; correct ones are reduced to a flag
+    compact = [
+        {'i': i, 'ok': h['is_correct'],
+         **({'q': h['question'], 'user': h['user_answer']} if not h['is_correct'] else {})}
+        for i, h in enumerate(st.session_state.quiz_history)
+    ]
     prompt = f"""
     Analyze performance for {details['name']} (Grade {details['grade']}):
     - Subject: {details['subject']}
     - Topic: {details['topic']}
-    - Score: {st.session_state.quiz['score']}/{len(st.session_state.quiz['questions'])}
-    - Question History: {st.session_state.quiz['history']}
+    - Score: {st.session_state.quiz_score}/{len(st.session_state.quiz_questions)}
+    - Question History (i=index, ok=correct, q/user=question and answer when wrong): {orjson.dumps(compact).decode()}
     
-    Provide 200-word analysis covering:
-    1. Strengths and weaknesses
-    2. Key areas needing improvement
-    3. Study recommendations
-    4. Encouraging feedback
+    Respond with a JSON object {{"feedback": "...", "study_plan": "..."}} where:
+    - "feedback" is a 200-word analysis covering strengths and weaknesses,
+      key areas needing improvement and encouraging feedback
+    - "study_plan" is a short list of study recommendations in markdown
     """
     
     try:
         client = get_groq_client()
-        response = client.chat.completions.create(
-            model="mixtral-8x7b-32768",
+        request = dict(
+            model=MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.5
         )
-        st.session_state.quiz['feedback'] = response.choices[0].message.content
+        try:
+            response = client.chat.completions.create(**request, response_format={"type": "json_object"})
+        except BadRequestError:
+            # Model without JSON mode: ask again and keep the reply as plain feedback
+            response = client.chat.completions.create(**request)
+        content = response.choices[0].message.content
+        try:
+            report = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            report = None
+        if not isinstance(report, dict):
+            report = {'feedback': content}
+        st.session_state.quiz_feedback = report.get('feedback') or content
+        st.session_state.quiz_study_plan = report.get('study_plan', '')
     except Exception as e:
         st.error(f"📝 Feedback Error: {str(e)}")
 
@@ -240,11 +641,13 @@ def debug_panel():
     """Show debugging information"""
     with st.expander("🐞 Debug Panel"):
         st.subheader("Raw API Response")
-        st.code(st.session_state.quiz.get('raw_response', 'No response captured'))
+        # Expander bodies execute even when collapsed, so large dumps are opt-in
+        if st.toggle("Show raw response", value=False):
+            st.code(st.session_state.quiz_raw_response or 'No response captured')
         
         st.subheader("Parsing Errors")
-        if st.session_state.quiz['parsing_errors']:
-            for error in st.session_state.quiz['parsing_errors']:
+        if st.session_state.quiz_parsing_errors:
+            for error in st.session_state.quiz_parsing_errors:
                 st.error(f"""
                 **Question Error**  
                 Type: {error['error_type']}  
@@ -255,76 +658,104 @@ def debug_panel():
             st.success("✅ No parsing errors detected")
         
         st.subheader("Session State")
-        st.json(st.session_state.quiz)
+        if st.toggle("Show session state", value=False):
+            st.json({
+                'user_details': st.session_state.quiz_user_details,
+                'current_q': st.session_state.quiz_current_q,
+                'score': st.session_state.quiz_score,
+                'questions': len(st.session_state.quiz_questions),
+                'answered': len(st.session_state.quiz_history),
+                'audio_cached': len(st.session_state.quiz_audio),
+                'chat_messages': len(st.session_state.quiz_chat_history),
+                'attempt_count': st.session_state.quiz_attempt_count
+            })
 
 def chat_interface():
     """Interactive study assistant"""
     st.subheader("💬 Study Assistant")
     
-    for msg in st.session_state.quiz['chat_history']:
+    for msg in st.session_state.quiz_chat_history:
         st.chat_message("user" if msg['is_user'] else "assistant").write(msg['content'])
     
     if prompt := st.chat_input("Ask about the topic..."):
-        st.session_state.quiz['chat_history'].append({'is_user': True, 'content': prompt})
+        st.session_state.quiz_chat_history.append({'is_user': True, 'content': prompt})
         
         try:
             client = get_groq_client()
             response = client.chat.completions.create(
-                model="mixtral-8x7b-32768",
+                model=MODEL,
                 messages=[{"role": "user", "content": prompt}]
             )
             reply = response.choices[0].message.content
-            st.session_state.quiz['chat_history'].append({'is_user': False, 'content': reply})
+            st.session_state.quiz_chat_history.append({'is_user': False, 'content': reply})
             st.rerun()
         except Exception as e:
             st.error(f"💬 Chat Error: {str(e)}")
 
-# Main application flow
-st.title("🎓 Smart Study Pro")
-st.caption("Powered by Groq AI • Adaptive Learning System")
+def main():
+    """Main application flow"""
+    init_session_state()
 
-# API Key Input
-st.session_state.quiz['api_key'] = st.text_input(
-    "Enter Groq API Key:",
-    type="password",
-    help="Get from https://console.groq.com/keys"
-)
+    st.title("🎓 Smart Study Pro")
+    st.caption("Powered by Groq AI • Adaptive Learning System")
 
-if st.session_state.quiz['api_key']:
-    if not st.session_state.quiz.get('user_details'):
-        user_details_form()
-    else:
-        if st.session_state.quiz['questions']:
-            show_question()
-        else:
+    # API Key Input
+    st.session_state.quiz_api_key = st.text_input(
+        "Enter Groq API Key:",
+        type="password",
+        help="Get from https://console.groq.com/keys"
+    )
+
+    if st.session_state.quiz_api_key:
+        if not st.session_state.get('quiz_user_details'):
             user_details_form()
+        else:
+            if st.session_state.quiz_questions:
+                if st.session_state.quiz_generation_warning:
+                    st.warning(f"⚠️ {st.session_state.quiz_generation_warning}")
+                show_question()
+            else:
+                user_details_form()
 
-    if st.session_state.quiz.get('feedback'):
-        st.subheader("📊 Performance Report")
-        st.write(st.session_state.quiz['feedback'])
-        
-        st.subheader("📝 Question Review")
-        for i, result in enumerate(st.session_state.quiz['history']):
-            with st.expander(f"Question {i+1}: {result['question']}", expanded=False):
-                st.markdown(f"""
-                **Your Answer:** {result['user_answer'] or 'No answer'}  
-                **Correct Answer:** {result['correct_answer']}  
-                **Result:** {"✅ Correct" if result['is_correct'] else "❌ Incorrect"}
-                """)
-        
-        if st.button("🔄 Retake Quiz"):
-            st.session_state.quiz.update({
-                'questions': [],
-                'current_q': 0,
-                'score': 0,
-                'history': [],
-                'feedback': ''
-            })
-            st.rerun()
+        if st.session_state.get('quiz_feedback'):
+            st.subheader("📊 Performance Report")
+            st.write(st.session_state.quiz_feedback)
+
+            if st.session_state.get('quiz_study_plan'):
+                st.subheader("📚 Study Plan")
+                st.write(st.session_state.quiz_study_plan)
+
+            st.subheader("📝 Question Review")
+            for i, result in enumerate(st.session_state.quiz_history):
+                with st.expander(f"Question {i+1}: {result['question']}", expanded=False):
+                    st.markdown(f"""
+                    **Your Answer:** {result['user_answer'] or 'No answer'}  
+                    **Correct Answer:** {result['correct_answer']}  
+                    **Result:** {"✅ Correct" if result['is_correct'] else "❌ Incorrect"}
+                    """)
+
+            if st.button("🔄 Retake Quiz"):
+                st.session_state.update({
+                    'quiz_questions': [],
+                    'quiz_generation_warning': '',
+                    'quiz_current_q': 0,
+                    'quiz_score': 0,
+                    'quiz_history': [],
+                    'quiz_feedback': '',
+                    'quiz_study_plan': ''
+                })
+                st.rerun()
+
+            # The study assistant is a post-quiz feature
+            chat_interface()
+
+        # Debug panel only mounts on request, e.g. ?debug=1
+        if st.query_params.get('debug') == '1':
+            debug_panel()
 
-    chat_interface()
-    debug_panel()
+    # Footer
+    st.markdown("---")
+    st.markdown("**Tips:** • Start with simple topics • Add ?debug=1 to the URL if issues occur • Refresh to start over")
 
-# Footer
-st.markdown("---")
-st.markdown("**Tips:** • Start with simple topics • Check debug panel if issues occur • Refresh to start over")
\ No newline at end of file
+if __name__ == "__main__":
+    main()